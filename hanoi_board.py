@@ -0,0 +1,67 @@
+"""Board geometry, colours and the solver, without any Tk dependency.
+
+Shared by the Tk canvas (tower_hanoi.py) and the headless renderer
+(hanoi_render.py), which must run on machines without Tk installed. The
+results are immutable and cached, so boards hosted in one process share them.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+BOARD_BG = "#0f0f13"
+PEG_COLOR = "#ff5f5f"
+BASE_COLOR = "#ff6d6d"
+DISC_MAX_W, DISC_MIN_W = 220, 80
+DISC_H = 22
+DISC_STEP = 24   # vertical distance between stacked discs
+MIN_DISCS, MAX_DISCS = 3, 8   # range offered by the game
+
+BoardLayout = namedtuple("BoardLayout", "width height base_y peg_x peg_top")
+
+@lru_cache(maxsize=64)
+def board_layout(w, h):
+    base_y = int(h * 0.8)
+    return BoardLayout(w, h, base_y, (int(w*0.2), int(w*0.5), int(w*0.8)), int(h * 0.25))
+
+def base_rect(layout):
+    margin = 60
+    return (margin//2, layout.base_y, layout.width - margin//2, layout.base_y + 8)
+
+def peg_rect(layout, peg_index):
+    x = layout.peg_x[peg_index]
+    return (x-5, layout.peg_top, x+5, layout.base_y)
+
+@lru_cache(maxsize=4096)
+def disc_rect(layout, num_discs, size, peg_index, level):
+    """(left, top, right, bottom) of a disc `level` positions above the base (0 = bottom)."""
+    width = int(DISC_MIN_W + (size-1) * (DISC_MAX_W - DISC_MIN_W) / max(1, num_discs - 1))
+    x_center = layout.peg_x[peg_index]
+    y = layout.base_y - 8 - level * DISC_STEP
+    return (x_center - width//2, y - DISC_H, x_center + width//2, y)
+
+@lru_cache(maxsize=None)
+def gen_palette(n):
+    """Generate n distinct PASTEL colors for dark background (a shared tuple)."""
+    import colorsys
+    colors = []
+    w = 0.18  # mix-with-white factor for extra pastel softness
+    for i in range(max(1, n)):
+        h = i / max(1, n)        # spread hues evenly
+        s = 0.28                 # lower saturation = pastel
+        v = 1.00                 # bright to stand out on dark bg
+        r, g, b = colorsys.hsv_to_rgb(h, s, v)
+        # Mix slightly with white to soften further
+        r = r*(1-w) + 1*w
+        g = g*(1-w) + 1*w
+        b = b*(1-w) + 1*w
+        colors.append(f"#{int(r*255):02x}{int(g*255):02x}{int(b*255):02x}")
+    return tuple(colors)
+
+def hanoi_moves(n, src=0, dst=2, aux=1, moves=None):
+    """Optimal solution as a list of (src, dst) peg indices."""
+    if moves is None:
+        moves = []
+    if n == 0: return moves
+    hanoi_moves(n-1, src, aux, dst, moves)
+    moves.append((src, dst))
+    hanoi_moves(n-1, aux, dst, src, moves)
+    return moves
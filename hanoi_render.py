@@ -0,0 +1,298 @@
+"""Headless rendering of Tower of Hanoi boards to PNG frames or an animated PNG.
+
+Uses the same layout math as the Tk canvas (board_layout / disc_rect in
+hanoi_board.py) and a tiny pure-Python rasterizer, so no display, no Tk and no
+imaging library are needed. Frames are rendered in batches across a process
+pool.
+
+    python hanoi_render.py solution --discs 8 --out frames/
+    python hanoi_render.py solution --discs 8 --out solution.png --animated
+    python hanoi_render.py replay session.log --discs 5 --out replay.png --animated
+    python hanoi_render.py replay events.jsonl --source lab-pc-3 --board 2 --game 4 --out game4.png --animated
+
+A replay is either a move log as shown in the Log window ("start, end, from,
+to" per line, pegs 1-3, with a trailing UNDO/REDO on rewinds) or a JSON-lines
+event file written by the telemetry collector (hanoi_telemetry.py --out).
+Such a file mixes senders, boards and games; replay renders one game of one
+stream, picked with --source / --board / --game (default: the last game).
+"""
+import json
+import os
+import struct
+import sys
+import zlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from hanoi_board import (BASE_COLOR, BOARD_BG, MAX_DISCS, MIN_DISCS, PEG_COLOR, base_rect, board_layout,
+                         disc_rect, gen_palette, hanoi_moves, peg_rect)
+
+DEFAULT_SIZE = (1176, 420)   # canvas area of the default 1200x520 window
+MAX_DELAY_MS = 65535         # APNG frame delays are u16 (delay_num / 1000 s)
+
+
+# ---------- Board states ----------
+
+def initial_state(num_discs):
+    """Pegs as tuples of disc sizes, bottom -> top."""
+    return (tuple(range(num_discs, 0, -1)), (), ())
+
+
+def states_for_moves(num_discs, moves, skipped=None):
+    """Board state before the first move and after each legal move.
+
+    Illegal moves are left out; if skipped is a list, (index, src, dst) is
+    appended to it for each of them.
+    """
+    pegs = [list(p) for p in initial_state(num_discs)]
+    states = [tuple(tuple(p) for p in pegs)]
+    for i, (src, dst) in enumerate(moves):
+        if not pegs[src] or (pegs[dst] and pegs[dst][-1] < pegs[src][-1]):
+            if skipped is not None:
+                skipped.append((i, src, dst))
+            continue
+        pegs[dst].append(pegs[src].pop())
+        states.append(tuple(tuple(p) for p in pegs))
+    return states
+
+
+Replay = namedtuple("Replay", "stream discs moves")
+
+
+def read_replays(path, source=None, board=None):
+    """Games in a move log or telemetry JSON-lines file, in file order.
+
+    A telemetry file can hold several senders ("src") and boards, each with
+    many games; events are grouped per (src, board) stream and split at
+    new_game / trial_start, optionally keeping only one source or board.
+    A Log-window move log is a single game with discs None. moves are
+    (src, dst) peg indices (0-2).
+    """
+    replays = []
+    current = {}    # stream -> Replay being filled
+    with open(path, encoding="utf-8-sig") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                event = json.loads(line)
+                stream = (event.get("src"), event.get("board"))
+                if (source is not None and str(stream[0]) != source) or \
+                        (board is not None and str(stream[1]) != board):
+                    continue
+                kind = event.get("event")
+                if kind in ("new_game", "trial_start"):
+                    current[stream] = Replay(stream, event.get("discs"), [])
+                    replays.append(current[stream])
+                elif kind in ("move", "undo", "redo"):
+                    if stream not in current:
+                        # the file starts mid-game
+                        current[stream] = Replay(stream, None, [])
+                        replays.append(current[stream])
+                    current[stream].moves.append((int(event["from_peg"]) - 1, int(event["to_peg"]) - 1))
+                continue
+            parts = [p.strip() for p in line.split(",")]
+            # "start, end, from, to[, UNDO|REDO]"; marker lines ("ms, GAMEOVER") have fewer fields
+            if len(parts) in (4, 5) and parts[2].isdigit() and parts[3].isdigit():
+                if None not in current:
+                    current[None] = Replay(None, None, [])
+                    replays.append(current[None])
+                current[None].moves.append((int(parts[2]) - 1, int(parts[3]) - 1))
+    return replays
+
+
+# ---------- Rasterizer ----------
+
+def _rgb(color):
+    color = color.lstrip("#")
+    return bytes(int(color[i:i+2], 16) for i in (0, 2, 4))
+
+
+def board_rects(state, num_discs, layout, palette):
+    """Filled rectangles (left, top, right, bottom, rgb) in canvas paint order."""
+    base_rgb, peg_rgb = _rgb(BASE_COLOR), _rgb(PEG_COLOR)
+    rects = [base_rect(layout) + (base_rgb,)]
+    rects += [peg_rect(layout, i) + (peg_rgb,) for i in range(3)]
+    for peg_index, stack in enumerate(state):
+        for level, size in enumerate(stack):
+            color = palette[size-1] if size-1 < len(palette) else "#cccccc"
+            left, top, right, bottom = disc_rect(layout, num_discs, size, peg_index, level)
+            # the canvas draws discs with a 2px outline of the fill colour
+            rects.append((left - 1, top - 1, right + 1, bottom + 1, _rgb(color)))
+    return rects
+
+
+def rasterize(rects, width, height, bg_rgb):
+    """Raw PNG scanlines (filter byte + RGB) for rectangles painted in order.
+
+    A row equal to the one above is written with the PNG "Up" filter, i.e. as
+    zeros, which deflates several times faster than repeating the pixels.
+    """
+    blank = b"\x00" + bg_rgb * width
+    same_as_above = b"\x02" + bytes(3 * width)
+    # Rows only change where a rectangle starts or ends, so build each distinct row once.
+    edges = {0, height}
+    for left, top, right, bottom, _ in rects:
+        edges.add(max(0, min(height, top)))
+        edges.add(max(0, min(height, bottom)))
+    edges = sorted(edges)
+    out = []
+    for y0, y1 in zip(edges, edges[1:]):
+        row = None
+        for left, top, right, bottom, rgb in rects:
+            if top <= y0 and bottom >= y1:
+                l, r = max(0, left), min(width, right)
+                if l < r:
+                    if row is None:
+                        row = bytearray(blank)
+                    row[1 + 3*l:1 + 3*r] = rgb * (r - l)
+        out.append(bytes(row) if row is not None else blank)
+        out.append(same_as_above * (y1 - y0 - 1))
+    return b"".join(out)
+
+
+def _chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def _ihdr(width, height):
+    return _chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+
+_PNG_SIG = b"\x89PNG\r\n\x1a\n"
+
+
+def encode_png(idat, width, height):
+    return _PNG_SIG + _ihdr(width, height) + _chunk(b"IDAT", idat) + _chunk(b"IEND", b"")
+
+
+def encode_apng(frames, width, height, delay_ms):
+    """Animated PNG from already-compressed frame data (one zlib stream per frame)."""
+    parts = [_PNG_SIG, _ihdr(width, height), _chunk(b"acTL", struct.pack(">II", len(frames), 0))]
+    seq = 0
+    for i, idat in enumerate(frames):
+        parts.append(_chunk(b"fcTL", struct.pack(">IIIIIHHBB", seq, width, height, 0, 0,
+                                                  delay_ms, 1000, 0, 0)))
+        seq += 1
+        if i == 0:
+            parts.append(_chunk(b"IDAT", idat))
+        else:
+            parts.append(_chunk(b"fdAT", struct.pack(">I", seq) + idat))
+            seq += 1
+    parts.append(_chunk(b"IEND", b""))
+    return b"".join(parts)
+
+
+# ---------- Frame batches (run in worker processes) ----------
+
+def _render_batch(states, num_discs, width, height, level):
+    layout = board_layout(width, height)
+    palette = gen_palette(num_discs)
+    bg_rgb = _rgb(BOARD_BG)
+    return [zlib.compress(rasterize(board_rects(s, num_discs, layout, palette), width, height, bg_rgb), level)
+            for s in states]
+
+
+def render_frames(states, num_discs, size=DEFAULT_SIZE, workers=None, batch_size=16, level=6):
+    """Compressed image data for every state, rendered in parallel batches; order is preserved."""
+    width, height = size
+    batches = [states[i:i + batch_size] for i in range(0, len(states), batch_size)]
+    if workers == 1 or len(batches) <= 1:
+        results = [_render_batch(b, num_discs, width, height, level) for b in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_render_batch, batches, [num_discs] * len(batches),
+                                    [width] * len(batches), [height] * len(batches), [level] * len(batches)))
+    return [frame for batch in results for frame in batch]
+
+
+def write_frames(states, num_discs, out_dir, size=DEFAULT_SIZE, workers=None):
+    """One PNG per state: out_dir/frame_00000.png, ..."""
+    os.makedirs(out_dir, exist_ok=True)
+    width, height = size
+    paths = []
+    for i, idat in enumerate(render_frames(states, num_discs, size, workers)):
+        path = os.path.join(out_dir, f"frame_{i:05d}.png")
+        with open(path, "wb") as f:
+            f.write(encode_png(idat, width, height))
+        paths.append(path)
+    return paths
+
+
+def write_animation(states, num_discs, path, size=DEFAULT_SIZE, workers=None, delay_ms=400):
+    width, height = size
+    data = encode_apng(render_frames(states, num_discs, size, workers), width, height, delay_ms)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def main(argv=None):
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Render Tower of Hanoi solutions and replays without a display")
+    parser.add_argument("mode", choices=("solution", "replay"))
+    parser.add_argument("log", nargs="?", help="move log or telemetry JSON-lines file (replay only)")
+    parser.add_argument("--discs", type=int, help="number of discs (replay: default from the log's new_game event)")
+    parser.add_argument("--source", help="replay only events from this telemetry source (src)")
+    parser.add_argument("--board", help="replay only events from this board")
+    parser.add_argument("--game", type=int, default=None,
+                        help="replay the Nth game of the stream, 1-based (default: the last one)")
+    parser.add_argument("--out", required=True, help="output directory, or .png file with --animated")
+    parser.add_argument("--animated", action="store_true", help="write a single animated PNG")
+    parser.add_argument("--size", default=f"{DEFAULT_SIZE[0]}x{DEFAULT_SIZE[1]}", help="WIDTHxHEIGHT")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--delay-ms", type=int, default=400, help="frame delay for --animated")
+    args = parser.parse_args(argv)
+
+    discs = args.discs
+    if discs is not None and not MIN_DISCS <= discs <= MAX_DISCS:
+        parser.error(f"--discs must be {MIN_DISCS}-{MAX_DISCS}")
+    if not 0 <= args.delay_ms <= MAX_DELAY_MS:
+        parser.error(f"--delay-ms must be 0-{MAX_DELAY_MS}")
+    if args.mode == "replay":
+        if not args.log:
+            parser.error("replay needs a log file")
+        replays = read_replays(args.log, args.source, args.board)
+        if not replays:
+            parser.error("no games in the log (check --source / --board)")
+        streams = sorted({r.stream for r in replays}, key=str)
+        if len(streams) > 1:
+            parser.error("the log holds several streams, pick one with --source / --board: "
+                         + ", ".join(f"src={s} board={b}" for s, b in streams))
+        if args.game is not None and not 1 <= args.game <= len(replays):
+            parser.error(f"--game must be between 1 and {len(replays)}")
+        replay = replays[-1 if args.game is None else args.game - 1]
+        moves = replay.moves
+        discs = discs or replay.discs
+        if not discs:
+            parser.error("--discs is needed: the log does not say how many discs were used")
+        if not isinstance(discs, int) or not MIN_DISCS <= discs <= MAX_DISCS:
+            parser.error(f"the log's game has {discs!r} discs, expected {MIN_DISCS}-{MAX_DISCS}")
+    else:
+        if not discs:
+            parser.error("solution needs --discs")
+        moves = hanoi_moves(discs)
+    try:
+        size = tuple(int(v) for v in args.size.lower().split("x"))
+    except ValueError:
+        size = ()
+    if len(size) != 2 or min(size) <= 0:
+        parser.error("--size must look like 1176x420")
+
+    t0 = time.perf_counter()
+    skipped = []
+    states = states_for_moves(discs, moves, skipped)
+    if skipped:
+        print(f"skipped {len(skipped)} illegal move(s): "
+              + ", ".join(f"#{i + 1} {src + 1}->{dst + 1}" for i, src, dst in skipped[:10])
+              + (" ..." if len(skipped) > 10 else ""), file=sys.stderr)
+    if args.animated:
+        write_animation(states, discs, args.out, size, args.workers, args.delay_ms)
+    else:
+        write_frames(states, discs, args.out, size, args.workers)
+    print(f"{len(states)} frames -> {args.out} in {time.perf_counter() - t0:.2f} s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+"""Live telemetry for Tower of Hanoi sessions.
+
+TelemetrySender streams game events from a HanoiGUI to a local collector
+without ever blocking the Tk loop: emit() only does a put_nowait() on a bounded
+queue, and a background thread batches, compresses and sends the events.
+When the collector is slow or down, batches are spilled to disk (if a spill
+file is configured) and re-sent once it is reachable again; otherwise they are
+dropped and counted.
+
+Endpoints:
+    tcp://HOST:PORT
+    unix:///path/to/socket
+    http://HOST:PORT[/path]
+
+Wire format: a batch is newline-separated JSON events, zlib-compressed.
+On tcp/unix each batch is prefixed with its 4-byte big-endian length; over
+http it is the body of a POST with "Content-Encoding: deflate".
+
+Reference collector (aggregates any number of streams):
+    python hanoi_telemetry.py tcp://127.0.0.1:9555 [--out events.jsonl]
+"""
+import json
+import os
+import queue
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+
+_LEN = struct.Struct(">I")
+
+
+def parse_endpoint(endpoint):
+    """'tcp://h:p' / 'unix:///path' / 'http://h:p/path' -> (scheme, address, path)."""
+    scheme, sep, rest = endpoint.partition("://")
+    if not sep:
+        raise ValueError(f"endpoint needs a scheme: {endpoint!r}")
+    if scheme == "unix":
+        return scheme, rest, None
+    if scheme not in ("tcp", "http"):
+        raise ValueError(f"unsupported endpoint scheme: {scheme!r}")
+    hostport, _, path = rest.partition("/")
+    host, _, port = hostport.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"endpoint needs host:port: {endpoint!r}")
+    return scheme, (host, int(port)), "/" + path
+
+
+def encode_batch(events):
+    return zlib.compress("\n".join(json.dumps(e, separators=(",", ":")) for e in events).encode("utf-8"))
+
+
+def decode_batch(body):
+    return [json.loads(line) for line in zlib.decompress(body).decode("utf-8").splitlines() if line]
+
+
+# ---------- Sender ----------
+
+class _StreamTransport:
+    """Length-prefixed batches over a TCP or Unix stream socket."""
+    def __init__(self, scheme, address, timeout):
+        self.scheme = scheme
+        self.address = address
+        self.timeout = timeout
+        self.sock = None
+
+    def send(self, body):
+        if self.sock is None:
+            family = socket.AF_UNIX if self.scheme == "unix" else socket.AF_INET
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.address)
+            except OSError:
+                sock.close()
+                raise
+            self.sock = sock
+        self.sock.sendall(_LEN.pack(len(body)) + body)
+
+    def close(self):
+        if self.sock is not None:
+            try: self.sock.close()
+            except OSError: pass
+            self.sock = None
+
+
+class _HttpTransport:
+    """One POST per batch on a keep-alive connection."""
+    def __init__(self, address, path, timeout):
+        self.address = address
+        self.path = path
+        self.timeout = timeout
+        self.conn = None
+
+    def send(self, body):
+        import http.client
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(*self.address, timeout=self.timeout)
+        try:
+            self.conn.request("POST", self.path, body=body,
+                              headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "deflate"})
+            resp = self.conn.getresponse()
+            resp.read()
+        except http.client.HTTPException as e:
+            # e.g. BadStatusLine; the sender treats it like any other delivery failure
+            raise OSError(f"bad HTTP response from collector: {e!r}") from e
+        if resp.status >= 300:
+            raise OSError(f"collector answered HTTP {resp.status}")
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class TelemetrySender:
+    def __init__(self, endpoint, source=None, max_queue=10000, batch_size=256, flush_interval=0.25,
+                 spill_path=None, max_spill_bytes=64 * 1024 * 1024, timeout=2.0):
+        scheme, address, path = parse_endpoint(endpoint)
+        if scheme == "http":
+            self.transport = _HttpTransport(address, path, timeout)
+        else:
+            self.transport = _StreamTransport(scheme, address, timeout)
+        self.source = source or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.max_spill_bytes = max_spill_bytes
+
+        self.queue = queue.Queue(max_queue)
+        self.seq = 0
+        self.dropped = 0        # events lost (queue full, or spill unavailable/full)
+        self.sent = 0
+        self.spilled = 0        # events spilled by this sender and not yet re-sent
+        self.retry_at = 0.0
+        self.backoff = 0.5
+        self._closing = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="hanoi-telemetry", daemon=True)
+        self.thread.start()
+
+    # Called from the Tk thread: must never block.
+    def emit(self, event, **fields):
+        self.seq += 1
+        item = {"src": self.source, "seq": self.seq, "t": time.time(), "event": event}
+        item.update(fields)
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=2.0):
+        """Flush what is queued (best effort within timeout) and stop the sender thread.
+
+        The thread closes the transport itself on its way out, so a send still
+        in progress after the timeout is not cut off underneath it.
+        """
+        self._closing.set()
+        self.thread.join(timeout)
+
+    def _run(self):
+        try:
+            self._trim_spill()
+            while True:
+                batch = self._next_batch()
+                if batch:
+                    try:
+                        self._deliver(batch)
+                    except Exception:
+                        # Anything unexpected costs this batch, not the rest of the session
+                        self.dropped += len(batch)
+                        self.transport.close()
+                elif self._closing.is_set():
+                    return
+        finally:
+            self.transport.close()
+
+    def _next_batch(self):
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _deliver(self, batch):
+        body = encode_batch(batch)
+        if time.monotonic() >= self.retry_at:
+            try:
+                if self.spill_path is not None and os.path.exists(self.spill_path):
+                    self._replay_spill()
+                self.transport.send(body)
+                self.sent += len(batch)
+                self.backoff = 0.5
+                return
+            except OSError:
+                self.transport.close()
+                self.retry_at = time.monotonic() + self.backoff
+                self.backoff = min(self.backoff * 2, 10.0)
+        self._spill(body, len(batch))
+
+    def _spill(self, body, count):
+        if self.spill_path is None:
+            self.dropped += count
+            return
+        try:
+            if os.path.exists(self.spill_path) and os.path.getsize(self.spill_path) >= self.max_spill_bytes:
+                self.dropped += count
+                return
+            record = _LEN.pack(count) + _LEN.pack(len(body)) + body
+            with open(self.spill_path, "ab", buffering=0) as f:
+                end = f.tell()
+                try:
+                    if f.write(record) != len(record):
+                        raise OSError("short write to spill file")
+                except OSError:
+                    f.truncate(end)   # don't leave half a record for later ones to land behind
+                    raise
+            self.spilled += count
+        except OSError:
+            self.dropped += count
+
+    def _trim_spill(self):
+        """Cut a torn record (crash or full disk during _spill) off the end of the spill file."""
+        if self.spill_path is None:
+            return
+        try:
+            with open(self.spill_path, "r+b") as f:
+                size = f.seek(0, os.SEEK_END)
+                pos = 0
+                while pos < size:
+                    f.seek(pos)
+                    head = f.read(8)
+                    if len(head) < 8 or pos + 8 + _LEN.unpack_from(head, 4)[0] > size:
+                        self.dropped += _torn_count(head)
+                        f.truncate(pos)
+                        break
+                    pos += 8 + _LEN.unpack_from(head, 4)[0]
+        except OSError:
+            pass   # no spill file (or unreadable; _replay_spill copes with a torn tail too)
+
+    def _replay_spill(self):
+        # Send spilled batches oldest first; keep the file until all of them went out.
+        with open(self.spill_path, "rb") as f:
+            data = f.read()
+        pos = 0
+        try:
+            while pos < len(data):
+                if pos + 8 > len(data) or pos + 8 + _LEN.unpack_from(data, pos + 4)[0] > len(data):
+                    # torn tail: those events are lost, the rest went out
+                    self.dropped += _torn_count(data[pos:pos + 8])
+                    break
+                count, = _LEN.unpack_from(data, pos)
+                size, = _LEN.unpack_from(data, pos + 4)
+                self.transport.send(data[pos + 8:pos + 8 + size])
+                pos += 8 + size
+                self.sent += count
+                self.spilled = max(0, self.spilled - count)
+        except OSError:
+            with open(self.spill_path, "wb") as f:
+                f.write(data[pos:])
+            raise
+        os.remove(self.spill_path)
+        self.spilled = 0
+
+
+def _torn_count(head):
+    """Event count from the header of a torn spill record, if that much of it was written."""
+    return _LEN.unpack_from(head)[0] if len(head) >= _LEN.size else 0
+
+
+# ---------- Reference collector ----------
+
+class Collector:
+    """Aggregates event streams from many sources; thread-safe."""
+    def __init__(self, out=None):
+        self.lock = threading.Lock()
+        self.sources = {}   # src -> {"events": n, "batches": n, "bytes": n, "last": t, "by_event": {...}}
+        self.out = out
+
+    def ingest(self, body):
+        events = decode_batch(body)
+        with self.lock:
+            for e in events:
+                stats = self.sources.get(e.get("src"))
+                if stats is None:
+                    stats = self.sources[e.get("src")] = {"events": 0, "batches": 0, "bytes": 0,
+                                                          "last": None, "by_event": {}}
+                stats["events"] += 1
+                stats["last"] = e.get("t")
+                by_event = stats["by_event"]
+                by_event[e.get("event")] = by_event.get(e.get("event"), 0) + 1
+            if events:
+                stats["batches"] += 1
+                stats["bytes"] += len(body)
+            if self.out is not None:
+                for e in events:
+                    self.out.write(json.dumps(e, ensure_ascii=False) + "\n")
+                self.out.flush()
+        return len(events)
+
+    def summary(self):
+        with self.lock:
+            lines = [f"{len(self.sources)} source(s)"]
+            for src, stats in sorted(self.sources.items(), key=lambda kv: str(kv[0])):
+                counts = ", ".join(f"{k}={v}" for k, v in sorted(stats["by_event"].items(), key=lambda kv: str(kv[0])))
+                lines.append(f"  {src}: {stats['events']} events in {stats['batches']} batches "
+                             f"({stats['bytes']} B) - {counts}")
+        return "\n".join(lines)
+
+
+def make_server(endpoint, collector):
+    """Build a socketserver/http.server for endpoint that feeds collector."""
+    import socketserver
+    scheme, address, _path = parse_endpoint(endpoint)
+
+    if scheme == "http":
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                try:
+                    collector.ingest(body)
+                    status = 204
+                except (zlib.error, ValueError):
+                    status = 400
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        return ThreadingHTTPServer(address, Handler)
+
+    class StreamHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            while True:
+                head = self.rfile.read(_LEN.size)
+                if len(head) < _LEN.size:
+                    return
+                size, = _LEN.unpack(head)
+                body = self.rfile.read(size)
+                if len(body) < size:
+                    return
+                try:
+                    collector.ingest(body)
+                except (zlib.error, ValueError):
+                    return
+
+    # Subclass instead of setting the flags on the stdlib classes themselves
+    if scheme == "unix":
+        if os.path.exists(address):
+            os.remove(address)
+
+        class Server(socketserver.ThreadingUnixStreamServer):
+            daemon_threads = True
+    else:
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+    return Server(address, StreamHandler)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Reference collector for Tower of Hanoi telemetry")
+    parser.add_argument("endpoint", help="tcp://HOST:PORT, unix:///PATH or http://HOST:PORT")
+    parser.add_argument("--out", help="append every received event to this JSON-lines file")
+    parser.add_argument("--report-every", type=float, default=5.0, metavar="SEC",
+                        help="print the aggregate summary every SEC seconds (default 5)")
+    args = parser.parse_args(argv)
+
+    out = open(args.out, "a", encoding="utf-8") if args.out else None
+    collector = Collector(out)
+    server = make_server(args.endpoint, collector)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"collecting on {args.endpoint}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(args.report_every)
+            print(collector.summary(), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        print(collector.summary(), flush=True)
+        if out is not None:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,380 @@
-﻿import tkinter as tk
-from tkinter import messagebox, filedialog, ttk
-import time
+﻿import time
+_IMPORT_T0 = time.perf_counter()
+
+import sys
+from array import array
+import tkinter as tk
 import csv
-import colorsys
+import heapq
+import itertools
+import math
+from collections import namedtuple
+from operator import itemgetter
+
+# messagebox / filedialog / ttk are imported where they are used: they are only
+# needed by secondary windows and dialogs, so keeping them off the import path
+# shortens cold start.
+
+# ---------- Board geometry ----------
+# Lives in hanoi_board so the headless renderer does not need Tk.
+from hanoi_board import (BASE_COLOR, BOARD_BG, MAX_DISCS, MIN_DISCS, PEG_COLOR, base_rect, board_layout,
+                         disc_rect, gen_palette, hanoi_moves, peg_rect)
+
+# ---------- Experiment protocol ----------
+Trial = namedtuple("Trial", "block discs timer_minutes")
+
+def load_protocol(path, participant=0, min_discs=MIN_DISCS, max_discs=MAX_DISCS):
+    """Trials from a schedule file, counterbalanced for one participant.
+
+    CSV: header with "discs", "timer" (minutes, 0 = off) and optionally
+    "block". JSON: a list of objects with the same keys. Trials keep their
+    block order; within a block the order is rotated by `participant`
+    (Latin-square counterbalancing).
+    """
+    if path.lower().endswith(".json"):
+        import json
+        with open(path, encoding="utf-8-sig") as f:
+            rows = json.load(f)
+        if not isinstance(rows, list):
+            raise ValueError("JSON protocol must be a list of trial objects")
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = list(csv.DictReader(f))
+    blocks = {}   # block -> [Trial], in first-seen order
+    for n, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            raise ValueError(f"trial {n}: expected an object with 'discs' and 'timer'")
+        row = {str(k).strip().lower(): v for k, v in row.items()}
+        try:
+            discs = _trial_int(row["discs"])
+            timer = _trial_int(row.get("timer", 0) or 0)
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"trial {n}: needs integer 'discs' and 'timer'")
+        if not min_discs <= discs <= max_discs or not 0 <= timer <= 99:
+            raise ValueError(f"trial {n}: discs must be {min_discs}-{max_discs} and timer 0-99")
+        block = str(row.get("block", "") or "").strip()
+        blocks.setdefault(block, []).append(Trial(block, discs, timer))
+    trials = []
+    for block_trials in blocks.values():
+        k = participant % len(block_trials)
+        trials += block_trials[k:] + block_trials[:k]
+    if not trials:
+        raise ValueError("protocol has no trials")
+    return trials
+
+def _trial_int(value):
+    # int() would quietly truncate a JSON 3.9 (or turn true into 1)
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"not an integer: {value!r}")
+    return int(value)
+
+class StartupProfile:
+    """Wall-clock time spent per startup phase (enabled with --startup-profile)."""
+    def __init__(self, t0):
+        self.t0 = t0
+        self.last = t0
+        self.phases = []  # (name, ms)
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self.last) * 1000))
+        self.last = now
+
+    def report(self, stream=None):
+        stream = stream or sys.stderr
+        for phase, ms in self.phases:
+            print(f"[startup] {phase:<14} {ms:8.1f} ms", file=stream)
+        print(f"[startup] {'total':<14} {(self.last - self.t0) * 1000:8.1f} ms", file=stream)
+
+class FrameScheduler:
+    """One Tk `after` chain shared by every board in the process.
+
+    Callbacks wait in a heap ordered by due time and only the earliest has a
+    pending `after`, so N boards with running timers cost a single Tk timer.
+    The chain is re-armed before each callback runs, so a callback that opens a
+    dialog (nested event loop) does not stall the other boards.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.heap = []           # (due, handle, callback)
+        self.pending = set()     # handles still in the heap
+        self.cancelled = set()   # subset of pending
+        self.handles = itertools.count(1)
+        self.job = None
+        self.job_due = None
+
+    def call_later(self, ms, callback):
+        handle = next(self.handles)
+        heapq.heappush(self.heap, (time.monotonic() + ms / 1000, handle, callback))
+        self.pending.add(handle)
+        self._arm()
+        return handle
+
+    def cancel(self, handle):
+        # Handles that already fired (or were cancelled) are ignored
+        if handle in self.pending:
+            self.cancelled.add(handle)
+
+    def _pop(self):
+        _due, handle, callback = heapq.heappop(self.heap)
+        self.pending.discard(handle)
+        self.cancelled.discard(handle)
+        return handle, callback
+
+    def _arm(self):
+        heap = self.heap
+        while heap and heap[0][1] in self.cancelled:
+            self._pop()
+        if not heap:
+            if self.job is not None:
+                self.root.after_cancel(self.job)
+                self.job = self.job_due = None
+            return
+        due = heap[0][0]
+        if self.job is not None:
+            if self.job_due <= due:
+                return
+            self.root.after_cancel(self.job)
+        self.job_due = due
+        self.job = self.root.after(max(0, int((due - time.monotonic()) * 1000)), self._run)
+
+    def _run(self):
+        self.job = self.job_due = None
+        now = time.monotonic() + 0.001
+        try:
+            while self.heap and self.heap[0][0] <= now:
+                cancelled = self.heap[0][1] in self.cancelled
+                _handle, callback = self._pop()
+                if cancelled:
+                    continue
+                self._arm()
+                callback()
+        finally:
+            self._arm()
+
+class RecordStore:
+    """In-app player records with a hash index for de-duplicating merged exports."""
+    # Header spellings seen in exports -> record key
+    HEADER_ALIASES = {
+        "Time spent (ms)": "Time spent(ms)",
+        "Time spent(ms)": "Time spent(ms)",
+    }
+    KEY_FIELDS = ("Name", "Num of Disc", "Saved at", "Move")
+    # Exports made before records carried "Saved at" are keyed on the whole row,
+    # plus the time spent in ms (taken from "Time spent" when the ms column is empty)
+    FALLBACK_KEY_FIELDS = ("Name", "Num of Disc", "Move", "Breaking rules", "Pressure", "Timer",
+                           "Remaining time")
+
+    def __init__(self):
+        self.records = []
+        self.keys = set()  # record_key() of every stored record
+        self.listeners = []  # called by notify() after records were added
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+
+    def notify(self):
+        for callback in list(self.listeners):
+            callback()
+
+    @classmethod
+    def record_key(cls, record):
+        if record.get("Saved at"):
+            return tuple(str(record.get(f, "")) for f in cls.KEY_FIELDS)
+        return tuple(str(record.get(f, "")) for f in cls.FALLBACK_KEY_FIELDS) + (
+            cls._key_ms(str(record.get("Time spent(ms)", "")), str(record.get("Time spent", ""))),)
+
+    @classmethod
+    def _key_ms(cls, ms, spent):
+        if ms:
+            return ms
+        parsed = cls._parse_clock_ms(spent)
+        return "" if parsed is None else str(parsed)
+
+    def add(self, record):
+        """Store record unless an identical one is already present. Returns True if added."""
+        key = self.record_key(record)
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        self.records.append(record)
+        return True
+
+    def merge_entries(self, entries, counts=None):
+        """Add (key, record) pairs from iter_file_entries(). Returns (added, duplicates).
+
+        counts, if given, is a [added, duplicates] list kept up to date as rows
+        are merged, so it is still right when entries raises partway through.
+        """
+        keys, records = self.keys, self.records
+        if counts is None:
+            counts = [0, 0]
+        for key, record in entries:
+            if key in keys:
+                counts[1] += 1
+                continue
+            keys.add(key)
+            records.append(record)
+            counts[0] += 1
+        return counts[0], counts[1]
+
+    def merge_files(self, paths):
+        """Stream rows from CSV/XLSX exports into the store.
+
+        Rows are read one at a time and only rows with a new key are kept, so
+        memory grows with the number of distinct records, not the input size.
+        Returns (added, duplicates, failed) where failed is a list of
+        (path, error, rows added before the error); those rows stay in the
+        store and are included in added.
+        """
+        added = duplicates = 0
+        failed = []
+        for path in paths:
+            counts = [0, 0]
+            try:
+                self.merge_entries(self.iter_file_entries(path), counts)
+            except Exception as e:
+                failed.append((path, e, counts[0]))
+            added += counts[0]
+            duplicates += counts[1]
+        return added, duplicates, failed
+
+    @classmethod
+    def iter_file_entries(cls, path):
+        """(record_key, normalized record) for every non-empty row of an export.
+
+        Touches no store state, so it can run in a worker thread.
+        """
+        lower = path.lower()
+        if lower.endswith(".csv"):
+            rows = cls._iter_csv_rows(path)
+        elif lower.endswith((".xlsx", ".xlsm")):
+            rows = cls._iter_xlsx_rows(path)
+        else:
+            raise ValueError("unsupported file type")
+        try:
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [cls.HEADER_ALIASES.get(h.strip(), h.strip()) for h in header]
+            if "Name" not in columns:
+                raise ValueError("missing 'Name' column")
+            index = {col: i for i, col in enumerate(columns) if col}
+            width = len(columns)
+
+            # Keys come straight from the raw row, matching record_key() of the normalized record
+            def key_getter(fields):
+                idx = [index.get(f) for f in fields]
+                if None not in idx:
+                    return itemgetter(*idx)
+                return lambda row: tuple(row[i] if i is not None else "" for i in idx)
+            primary_key = key_getter(cls.KEY_FIELDS)
+            fallback_key = key_getter(cls.FALLBACK_KEY_FIELDS)
+            saved_at = index.get("Saved at")
+            ms_i = index.get("Time spent(ms)")
+            spent_i = index.get("Time spent")
+
+            key_ms, normalize = cls._key_ms, cls.normalize
+            for row in rows:
+                if len(row) < width:
+                    if not any(row):
+                        continue
+                    row = list(row) + [""] * (width - len(row))
+                if saved_at is not None and row[saved_at]:
+                    key = primary_key(row)
+                else:
+                    if not any(row):
+                        continue
+                    key = fallback_key(row) + (key_ms(row[ms_i] if ms_i is not None else "",
+                                                      row[spent_i] if spent_i is not None else ""),)
+                yield key, normalize({col: row[i] for col, i in index.items()})
+        finally:
+            rows.close()
+
+    @staticmethod
+    def _iter_csv_rows(path):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.reader(f)
+
+    @staticmethod
+    def _iter_xlsx_rows(path):
+        """Rows of the active sheet as text, matching what the CSV reader yields."""
+        import openpyxl
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            for row in wb.active.iter_rows(values_only=True):
+                yield [RecordStore._cell_text(v) for v in row]
+        finally:
+            wb.close()
+
+    @staticmethod
+    def _cell_text(value):
+        if value is None:
+            return ""
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+
+    @classmethod
+    def normalize(cls, record):
+        """Fill in whichever of "Time spent" / "Time spent(ms)" an imported row is missing."""
+        ms = record.get("Time spent(ms)", "")
+        spent = record.get("Time spent", "")
+        if ms:
+            if not spent:
+                record["Time spent"] = HanoiGUI._format_elapsed_ms(ms)
+        else:
+            ms = cls._parse_clock_ms(spent)
+            record["Time spent(ms)"] = "" if ms is None else str(ms)
+        return record
+
+    @staticmethod
+    def _parse_clock_ms(text):
+        """'MM:SS' or 'HH:MM:SS' -> ms."""
+        parts = text.split(":") if text else []
+        if len(parts) not in (2, 3):
+            return None
+        try:
+            seconds = 0
+            for part in parts:
+                seconds = seconds * 60 + int(part)
+        except ValueError:
+            return None
+        return seconds * 1000
 
 class HanoiGUI:
-    def __init__(self, root):
+    def __init__(self, root, profile=None, telemetry=None, parent=None, scheduler=None, store=None,
+                 board_id=None, protocol=None):
+        # parent/scheduler/store are given when BoardHost runs several boards in one root
         self.root = root
-        self.root.title("Tower of Hanoi - GUI (Drag & Drop)")
-        self.root.geometry("1200x520")
-        self.root.minsize(1200, 520)
+        self.parent = parent if parent is not None else root
+        self.hosted = parent is not None  # several boards share the root: no modal dialogs
+        self.scheduler = scheduler or FrameScheduler(root)
+        self.profile = profile
+        self.telemetry = telemetry  # hanoi_telemetry.TelemetrySender or None
+        self.board_id = board_id
+        if parent is None:
+            self.root.title("Tower of Hanoi - GUI (Drag & Drop)")
+            self.root.geometry("1200x520")
+            self.root.minsize(1200, 520)
 
         # ---- Theme ----
-        self.bg = "#0f0f13"
+        self.bg = BOARD_BG
         self.fg = "#d7e3ff"
         self.accent = "#8ab4ff"
-        self.peg_color = "#ff5f5f"
-        self.base_color = "#ff6d6d"
+        self.peg_color = PEG_COLOR
+        self.base_color = BASE_COLOR
         self.move_fg = "#8be9fd"
         self.btn_bg = "#2a2f3a"
         self.btn_hover = "#394153"
         self.timer_fg = "#ffd86b"
 
-        self.root.configure(bg=self.bg)
+        self.parent.configure(bg=self.bg)
 
         # ---- Game state ----
         self.num_discs = 3
-        self.max_discs = 8
-        self.min_discs = 3
+        self.max_discs = MAX_DISCS
+        self.min_discs = MIN_DISCS
         self.moves = 0
         self.pegs = [[], [], []]  # bottom -> top
         self.disc_sizes = {}
@@ -35,6 +382,7 @@ class HanoiGUI:
         # Drag & drop
         self.dragging_disc = None
         self.drag_from_peg = None
+        self.snap_jobs = {}   # disc -> scheduler handle of its running snap animation
         self.drag_offset_x = 0
         self.drag_offset_y = 0
         self.interactions_enabled = True
@@ -44,8 +392,12 @@ class HanoiGUI:
         # --- Move logging (time since first click) ---
         self.first_click_baseline = None
         self.current_move_start_rel = None
-        self.move_logs = []  # (start_rel, end_rel, from_peg(1-3), to_peg(1-3))
+        self.move_logs = []  # (start_rel, end_rel, from_peg(1-3), to_peg(1-3)[, "UNDO"/"REDO"])
         self.completed_elapsed_ms = None
+
+        # --- Undo / redo: one packed byte per move, see _pack_move ---
+        self.history = array("B")
+        self.redo_stack = array("B")
         self.pressure_rating = None
         self.log_window = None
         self.log_text = None
@@ -57,35 +409,51 @@ class HanoiGUI:
         self.game_over = False
 
         # --- Player records / table ---
-        self.records = []      # dict: Name, Num of Disc, Move, Breaking rules, Timer, Remaining time
+        self.store = store or RecordStore()
+        self.store.subscribe(self._refresh_table_window)
+        self.records = self.store.records  # dict: Name, Num of Disc, Move, Breaking rules, Timer, Remaining time, ...
         self.table_window = None
         self.table_tree = None
+        self.table_row_count = 0   # records already inserted into table_tree
+        self.table_fill_job = None
+        self.import_job = None     # state of a running _start_import
+
+        # --- Protocol mode: a fixed list of Trials, next one pre-staged on the canvas ---
+        self.protocol = protocol
+        self.trial_index = 0
+        self.trial_finished = False
+        self.trial_end_t0 = None   # perf_counter() when the finished trial was handed to Save
+        self.game_serial = 0       # bumped by _reset_game_state; ties dialogs to their game
+        self.rating_dialog = None  # open non-modal pressure rating dialog (hosted boards)
+        self.staged_trial = None   # (Trial, hidden disc item ids bottom -> top)
+        if protocol is not None:
+            self.num_discs = protocol[0].discs
+            self.timer_minutes = protocol[0].timer_minutes
+
+        # The first board is laid out on the first <Configure> (real canvas size);
+        # drawing earlier would only be thrown away by the resize redraw.
+        self.board_laid_out = False
+        self.canvas_size = None
 
         self._build_ui()
+        self._mark_startup("build ui")
         self._new_game()
+        self._mark_startup("new game")
+
+    def _mark_startup(self, phase):
+        if self.profile is not None:
+            self.profile.mark(phase)
 
-    # ---------- Color palette ----------
-
-    def _gen_palette(self, n):
-        """Generate n distinct PASTEL colors for dark background."""
-        colors = []
-        w = 0.18  # mix-with-white factor for extra pastel softness
-        for i in range(max(1, n)):
-            h = i / max(1, n)        # spread hues evenly
-            s = 0.28                 # lower saturation = pastel
-            v = 1.00                 # bright to stand out on dark bg
-            import colorsys
-            r, g, b = colorsys.hsv_to_rgb(h, s, v)
-            # Mix slightly with white to soften further
-            r = r*(1-w) + 1*w
-            g = g*(1-w) + 1*w
-            b = b*(1-w) + 1*w
-            colors.append(f"#{int(r*255):02x}{int(g*255):02x}{int(b*255):02x}")
-        return colors
+    def _emit(self, event, **fields):
+        # Non-blocking: the sender only enqueues here.
+        if self.telemetry is not None:
+            if self.board_id is not None:
+                fields["board"] = self.board_id
+            self.telemetry.emit(event, **fields)
 
     # ---------- UI ----------
     def _build_ui(self):
-        top = tk.Frame(self.root, bg=self.bg)
+        top = tk.Frame(self.parent, bg=self.bg)
         top.pack(fill="x", padx=12, pady=8)
 
         # Disks control
@@ -110,9 +478,13 @@ class HanoiGUI:
         self.btn_restart = self._mk_btn(top, "Restart", self._new_game)
         self.btn_log = self._mk_btn(top, "Log", self._open_log_window)
         self.btn_solve = self._mk_btn(top, "Solve!", self._solve_animate)
+        self.btn_undo = self._mk_btn(top, "Undo", self._undo)
+        self.btn_redo = self._mk_btn(top, "Redo", self._redo)
         self.btn_restart.pack(side="left", padx=4)
         self.btn_log.pack(side="left", padx=4)
         self.btn_solve.pack(side="left", padx=4)
+        self.btn_undo.pack(side="left", padx=4)
+        self.btn_redo.pack(side="left", padx=4)
 
         # Timer controls (right side)
         spacer = tk.Frame(top, bg=self.bg)
@@ -136,11 +508,11 @@ class HanoiGUI:
         self.name_entry.pack(side="left")
 
         # Canvas
-        self.canvas = tk.Canvas(self.root, bg=self.bg, highlightthickness=0)
+        self.canvas = tk.Canvas(self.parent, bg=self.bg, highlightthickness=0)
         self.canvas.pack(fill="both", expand=True, padx=12, pady=4)
 
         # Bottom: Save / Table + Min moves
-        bottom = tk.Frame(self.root, bg=self.bg)
+        bottom = tk.Frame(self.parent, bg=self.bg)
         bottom.pack(fill="x", padx=12, pady=(0,10))
         self.btn_save = self._mk_btn(bottom, "Save", self._save_record)
         self.btn_table = self._mk_btn(bottom, "Table", self._open_table_window)
@@ -150,13 +522,28 @@ class HanoiGUI:
         self.min_moves_label = tk.Label(bottom, text="", bg=self.bg, fg=self.fg, font=("Segoe UI", 11))
         self.min_moves_label.pack(side="right")
 
+        if self.protocol is not None:
+            # Trial settings come from the schedule, not the operator
+            self.protocol_label = tk.Label(bottom, text="", bg=self.bg, fg=self.accent, font=("Segoe UI", 11))
+            self.protocol_label.pack(side="right", padx=(0, 16))
+            # Restart too: it would reset a running trial or replay a finished protocol
+            for btn in (minus, plus, self.btn_timer_minus, self.btn_timer_plus, self.btn_solve, self.btn_restart):
+                btn.config(state="disabled")
+
         # Mouse bindings
         self.canvas.bind("<Button-1>", self._on_mouse_down)
         self.canvas.bind("<B1-Motion>", self._on_mouse_move)
         self.canvas.bind("<ButtonRelease-1>", self._on_mouse_up)
+        # Keyboard undo/redo on the canvas (not the root) so the Name entry and
+        # other hosted boards keep their own Ctrl+Z.
+        # Caps Lock turns Ctrl+Z into <Control-Z>; Tk prefers the Shift binding when Shift is held
+        for seq, action in (("<Control-z>", self._undo), ("<Control-Z>", self._undo),
+                            ("<Control-y>", self._redo), ("<Control-Y>", self._redo),
+                            ("<Control-Shift-Z>", self._redo)):
+            self.canvas.bind(seq, lambda e, action=action: action())
 
         # Resize handling
-        self.canvas.bind("<Configure>", lambda e: self._redraw())
+        self.canvas.bind("<Configure>", self._on_canvas_configure)
 
     def _mk_btn(self, parent, text, cmd):
         return tk.Button(parent, text=text, command=cmd, bg=self.btn_bg, fg=self.fg,
@@ -167,14 +554,37 @@ class HanoiGUI:
     # ---------- Setup / Restart ----------
     def _reset_timer(self):
         if self.timer_job is not None:
-            try: self.root.after_cancel(self.timer_job)
-            except Exception: pass
+            self.scheduler.cancel(self.timer_job)
             self.timer_job = None
         self.timer_seconds_left = None
         self.game_over = False
         self.timer_label.config(text="00:00")
 
     def _new_game(self):
+        self._reset_game_state()
+
+        # rebuild board
+        self.canvas.delete("all")
+        self.pegs = [[], [], []]
+        self.disc_sizes.clear()
+        self.staged_trial = None
+        # generate pastel colors for current number of discs
+        self.palette = gen_palette(self.num_discs)
+        if self.board_laid_out:
+            self._draw_board()
+            self._spawn_discs(self.num_discs)
+            self._stage_next_trial()
+        self._update_min_moves()
+
+        self._emit("new_game", discs=self.num_discs, timer_minutes=self.timer_minutes)
+
+    def _reset_game_state(self):
+        # A rating dialog still open belongs to the game being discarded
+        self.game_serial += 1
+        if self.rating_dialog is not None:
+            if self._widget_exists(self.rating_dialog):
+                self.rating_dialog.destroy()
+            self.rating_dialog = None
         self.moves = 0
         self._update_moves()
         self.rule_break_attempts = 0
@@ -189,16 +599,9 @@ class HanoiGUI:
         self.move_logs = []
         self.completed_elapsed_ms = None
         self.pressure_rating = None
-
-        # rebuild board
-        self.canvas.delete("all")
-        self.pegs = [[], [], []]
-        self.disc_sizes.clear()
-        self._draw_board()
-        # generate pastel colors for current number of discs
-        self.palette = self._gen_palette(self.num_discs)
-        self._spawn_discs(self.num_discs)
-        self._update_min_moves()
+        self.history = array("B")
+        self.redo_stack = array("B")
+        self.trial_finished = False
 
         self._refresh_log_window()
 
@@ -224,16 +627,18 @@ class HanoiGUI:
             self._tick_timer()
 
     def _tick_timer(self):
+        self.timer_job = None  # this callback has fired; nothing left to cancel
         if self.timer_seconds_left is None:
             return
         mins = self.timer_seconds_left // 60
         secs = self.timer_seconds_left % 60
         self.timer_label.config(text=f"{mins:02d}:{secs:02d}")
+        self._emit("timer_tick", seconds_left=self.timer_seconds_left)
         if self.timer_seconds_left <= 0:
             self._on_time_up()
             return
         self.timer_seconds_left -= 1
-        self.timer_job = self.root.after(1000, self._tick_timer)
+        self.timer_job = self.scheduler.call_later(1000, self._tick_timer)
 
     def _on_time_up(self):
         self.game_over = True
@@ -243,27 +648,52 @@ class HanoiGUI:
             self.completed_elapsed_ms = now_ms
             self.move_logs.append((now_ms, now_ms, "-", "GAMEOVER"))
             self._refresh_log_window()
+        self._emit("gameover", moves=self.moves, elapsed_ms=self.completed_elapsed_ms)
 
-        self._capture_pressure_rating()
-        messagebox.showerror("GAMEOVER", "หมดเวลาแล้ว!")
+        def after_rating():
+            self._show_notice("error", "GAMEOVER", "หมดเวลาแล้ว!")
+            if self.protocol is not None:
+                self._finish_trial()
+        self._capture_pressure_rating(after_rating)
 
     # ---------- Drawing ----------
+    def _on_canvas_configure(self, event):
+        size = (event.width, event.height)
+        if size == self.canvas_size:
+            return
+        self.canvas_size = size
+        if self.board_laid_out:
+            self._redraw()
+            return
+        # First real size: lay out the initial board once.
+        self.board_laid_out = True
+        self._draw_board()
+        self._spawn_discs(self.num_discs)
+        self._stage_next_trial()
+        self._update_protocol_label()
+        self._mark_startup("first layout")
+        if self.profile is not None:
+            self.root.after_idle(self._finish_startup_profile)
+
+    def _finish_startup_profile(self):
+        self._mark_startup("first idle")
+        self.profile.report()
+
     def _draw_board(self):
         w = self.canvas.winfo_width() or self.canvas.winfo_reqwidth()
         h = self.canvas.winfo_height() or self.canvas.winfo_reqheight()
-        margin = 60
-        base_y = int(h * 0.8)
-        self.base_y = base_y
+        self.layout = board_layout(w, h)
+        self.base_y = self.layout.base_y
 
-        self.canvas.create_rectangle(margin//2, base_y, w - margin//2, base_y + 8,
+        self.canvas.create_rectangle(*base_rect(self.layout),
                                      fill=self.base_color, outline=self.base_color, tags=("base",))
-        self.peg_x = [int(w*0.2), int(w*0.5), int(w*0.8)]
-        self.peg_top = int(h * 0.25)
-        self.peg_bottom = base_y
+        self.peg_x = list(self.layout.peg_x)
+        self.peg_top = self.layout.peg_top
+        self.peg_bottom = self.layout.base_y
 
         self.peg_items = []
-        for x in self.peg_x:
-            peg = self.canvas.create_rectangle(x-5, self.peg_top, x+5, self.peg_bottom,
+        for i in range(3):
+            peg = self.canvas.create_rectangle(*peg_rect(self.layout, i),
                                                fill=self.peg_color, outline=self.peg_color, tags=("peg",))
             self.peg_items.append(peg)
 
@@ -272,23 +702,14 @@ class HanoiGUI:
             self._create_disc(0, size)
 
     def _create_disc(self, peg_index, size):
-        max_w, min_w = 220, 80
-        width = int(min_w + (size-1) * (max_w - min_w) / max(1, self.num_discs - 1))
-        height = 22
-        x_center = self.peg_x[peg_index]
-        y = self._disc_y_for_peg(peg_index)
-        left, right = x_center - width//2, x_center + width//2
+        rect = disc_rect(self.layout, self.num_discs, size, peg_index, len(self.pegs[peg_index]))
         color = self.palette[size-1] if size-1 < len(self.palette) else '#cccccc'
-        disc = self.canvas.create_rectangle(left, y-height, right, y, fill=color,
+        disc = self.canvas.create_rectangle(*rect, fill=color,
                                             outline=color, width=2, tags=("disc",))
         self.pegs[peg_index].append(disc)
         self.disc_sizes[disc] = size
         self._raise_top(peg_index)
 
-    def _disc_y_for_peg(self, peg_index):
-        stack_height = len(self.pegs[peg_index])
-        return self.base_y - 8 - stack_height * 24
-
     def _raise_top(self, peg_index):
         for disc in self.pegs[peg_index]:
             self.canvas.tag_raise(disc)
@@ -299,19 +720,17 @@ class HanoiGUI:
         for peg_index, stack in enumerate(self.pegs):
             for level, disc in enumerate(stack[:]):
                 size = self.disc_sizes[disc]
-                max_w, min_w = 220, 80
-                width = int(min_w + (size-1) * (max_w - min_w) / max(1, self.num_discs - 1))
-                height = 22
-                x_center = self.peg_x[peg_index]
-                y = self.base_y - 8 - (len(stack) - level) * 24
-                left, right = x_center - width//2, x_center + width//2
+                rect = disc_rect(self.layout, self.num_discs, size, peg_index, level)
                 color = self.canvas.itemcget(disc, "fill")
                 self.canvas.delete(disc)
-                new_disc = self.canvas.create_rectangle(left, y-height, right, y, fill=color,
+                new_disc = self.canvas.create_rectangle(*rect, fill=color,
                                                         outline=color, width=2, tags=("disc",))
                 self.disc_sizes[new_disc] = size
                 stack[level] = new_disc
         self._update_min_moves()
+        # staged items went with delete("all"); rebuild them for the new size
+        self.staged_trial = None
+        self._stage_next_trial()
 
     # ---------- Drag & Drop ----------
     def _nearest_peg_from_x(self, x):
@@ -319,6 +738,7 @@ class HanoiGUI:
         return min(range(3), key=lambda i: distances[i])
 
     def _on_mouse_down(self, event):
+        self.canvas.focus_set()
         if not self.interactions_enabled or self.game_over:
             return
         peg = self._nearest_peg_from_x(event.x)
@@ -327,6 +747,7 @@ class HanoiGUI:
         top_disc = self.pegs[peg][-1]
         bbox = self.canvas.bbox(top_disc)
         if bbox and bbox[0] <= event.x <= bbox[2] and bbox[1] <= event.y <= bbox[3]:
+            self._cancel_snap(top_disc)
             self.dragging_disc = top_disc
             self.drag_from_peg = peg
             self.drag_offset_x = event.x - ((bbox[0]+bbox[2])//2)
@@ -381,6 +802,8 @@ class HanoiGUI:
             self._snap_disc_to_peg(self.dragging_disc, target_peg)
             self.moves += 1
             self._update_moves()
+            self._record_move(size, self.drag_from_peg, target_peg)
+            self._emit("move", disc=size, from_peg=self.drag_from_peg+1, to_peg=target_peg+1, moves=self.moves)
             if self.first_click_baseline is not None and self.current_move_start_rel is not None:
                 end_rel = time.perf_counter() - self.first_click_baseline
                 self._append_move_log(self.current_move_start_rel, end_rel, self.drag_from_peg, target_peg)
@@ -389,39 +812,99 @@ class HanoiGUI:
             if attempted_rule_break:
                 self.rule_break_attempts += 1
                 self._update_rule_breaks()
+                self._emit("rule_break", disc=size, from_peg=self.drag_from_peg+1, to_peg=target_peg+1,
+                           attempts=self.rule_break_attempts)
             self._snap_disc_to_peg(self.dragging_disc, self.drag_from_peg)
 
         self.dragging_disc = None
         self.drag_from_peg = None
         self.current_move_start_rel = None
 
-    def _snap_disc_to_peg(self, disc, peg_index):
+    def _snap_disc_to_peg(self, disc, peg_index, steps=8):
+        """Glide disc into its slot in 8 ms frames on the shared scheduler (no busy-wait)."""
+        # disc is already in self.pegs[peg_index]; its index there is its level
         size = self.disc_sizes[disc]
-        max_w, min_w = 220, 80
-        width = int(min_w + (size-1) * (max_w - min_w) / max(1, self.num_discs - 1))
-        height = 22
-        x_center = self.peg_x[peg_index]
-        y = self._disc_y_for_peg(peg_index)
-        left, right = x_center - width//2, x_center + width//2
-        bbox = self.canvas.bbox(disc)
-        if not bbox: return
-        current_x = (bbox[0]+bbox[2])//2
-        current_y = (bbox[1]+bbox[3])//2
-        target_x = (left+right)//2
-        target_y = y - height//2
-        steps = 8
-        for i in range(steps):
-            dx = (target_x - current_x) / (steps - i)
-            dy = (target_y - current_y) / (steps - i)
-            self.canvas.move(disc, dx, dy)
-            self.canvas.update_idletasks()
-            self.canvas.after(8)
-            current_x += dx
-            current_y += dy
-        bbox = self.canvas.bbox(disc)
-        dx = target_x - (bbox[0]+bbox[2])//2
-        dy = target_y - (bbox[1]+bbox[3])//2
-        self.canvas.move(disc, dx, dy)
+        level = self.pegs[peg_index].index(disc)
+        target = disc_rect(self.layout, self.num_discs, size, peg_index, level)
+        self._cancel_snap(disc)
+
+        def step(remaining):
+            coords = self.canvas.coords(disc)
+            if not coords:   # item deleted by a new game or a redraw
+                self.snap_jobs.pop(disc, None)
+                return
+            if remaining <= 1:
+                self.snap_jobs.pop(disc, None)
+                self.canvas.coords(disc, *target)
+                return
+            self.canvas.move(disc, (target[0] - coords[0]) / remaining, (target[1] - coords[1]) / remaining)
+            self.snap_jobs[disc] = self.scheduler.call_later(8, lambda: step(remaining - 1))
+        step(steps)
+
+    def _cancel_snap(self, disc):
+        job = self.snap_jobs.pop(disc, None)
+        if job is not None:
+            self.scheduler.cancel(job)
+
+    # ---------- Undo / Redo ----------
+    @staticmethod
+    def _pack_move(size, src, dst):
+        # disc size (1-8) in the high nibble, from/to peg (0-2) in two bits each
+        return (size << 4) | (src << 2) | dst
+
+    @staticmethod
+    def _unpack_move(delta):
+        return delta >> 4, (delta >> 2) & 3, delta & 3
+
+    def _record_move(self, size, src, dst):
+        self.history.append(self._pack_move(size, src, dst))
+        if self.redo_stack:
+            self.redo_stack = array("B")
+
+    def _can_rewind(self):
+        return (self.interactions_enabled and not self.game_over and not self.solving
+                and self.dragging_disc is None)
+
+    def _undo(self):
+        if not self._can_rewind() or not self.history:
+            return
+        delta = self.history.pop()
+        size, src, dst = self._unpack_move(delta)
+        self._move_top_disc(dst, src)
+        self.redo_stack.append(delta)
+        self.moves -= 1
+        self._update_moves()
+        self._log_rewind("UNDO", dst, src)
+        self._emit("undo", disc=size, from_peg=dst+1, to_peg=src+1, moves=self.moves)
+
+    def _redo(self):
+        if not self._can_rewind() or not self.redo_stack:
+            return
+        delta = self.redo_stack.pop()
+        size, src, dst = self._unpack_move(delta)
+        self._move_top_disc(src, dst)
+        self.history.append(delta)
+        self.moves += 1
+        self._update_moves()
+        self._log_rewind("REDO", src, dst)
+        self._emit("redo", disc=size, from_peg=src+1, to_peg=dst+1, moves=self.moves)
+        self._check_win()
+
+    def _move_top_disc(self, src, dst):
+        """Move one disc item straight to its slot: O(1), no animation and no _redraw."""
+        disc = self.pegs[src].pop()
+        self.pegs[dst].append(disc)
+        self._cancel_snap(disc)
+        rect = disc_rect(self.layout, self.num_discs, self.disc_sizes[disc], dst, len(self.pegs[dst]) - 1)
+        self.canvas.coords(disc, *rect)
+        self.canvas.tag_raise(disc)
+
+    def _log_rewind(self, kind, src, dst):
+        if self.first_click_baseline is None:
+            return
+        now_ms = int((time.perf_counter() - self.first_click_baseline) * 1000)
+        self.move_logs.append((now_ms, now_ms, src+1, dst+1, kind))
+        self._refresh_log_window()
 
     # ---------- Game logic ----------
     def _update_moves(self):
@@ -437,17 +920,20 @@ class HanoiGUI:
         if len(self.pegs[2]) == self.num_discs and not self.game_over:
             self.interactions_enabled = False
             if self.timer_job is not None:
-                try: self.root.after_cancel(self.timer_job)
-                except Exception: pass
+                self.scheduler.cancel(self.timer_job)
                 self.timer_job = None
             if self.first_click_baseline is not None:
                 now_ms = int((time.perf_counter() - self.first_click_baseline) * 1000)
                 self.completed_elapsed_ms = now_ms
                 self.move_logs.append((now_ms, now_ms, "-", "Success!"))
                 self._refresh_log_window()
+            self._emit("success", moves=self.moves, elapsed_ms=self.completed_elapsed_ms)
 
-            self._capture_pressure_rating()
-            messagebox.showinfo("You win!", f"Great job! You solved it in {self.moves} moves.")
+            def after_rating():
+                self._show_notice("info", "You win!", f"Great job! You solved it in {self.moves} moves.")
+                if self.protocol is not None:
+                    self._finish_trial()
+            self._capture_pressure_rating(after_rating)
 
     # ---------- Move log ----------
     def _append_move_log(self, start_rel, end_rel, from_peg, to_peg):
@@ -489,6 +975,8 @@ class HanoiGUI:
                     lines.append(f"{a}, {d}")
                 else:
                     lines.append(f"{a}, {b}, {c}, {d}")
+            elif isinstance(item, tuple) and len(item) == 5:
+                lines.append(", ".join(str(v) for v in item))
             else:
                 lines.append(str(item))
         self.log_text.config(state="normal")
@@ -524,19 +1012,84 @@ class HanoiGUI:
                     continue
         return None
 
-    def _capture_pressure_rating(self):
+    def _capture_pressure_rating(self, then=None):
+        """Ask for the rating, then call `then`. Hosted boards ask without blocking.
+
+        The answer only counts for the game that asked: after a restart a late
+        answer is ignored and `then` is not called.
+        """
+        game = self.game_serial
+
+        def done(rating):
+            self.rating_dialog = None
+            if game != self.game_serial:
+                return
+            if rating is not None and self.pressure_rating is None:
+                self.pressure_rating = rating
+                self._emit("pressure", rating=rating)
+            if then is not None:
+                then()
         if self.pressure_rating is not None:
-            return
-        rating = self._prompt_pressure_rating()
-        if rating is not None:
-            self.pressure_rating = rating
+            done(None)
+        elif self.hosted:
+            self.rating_dialog = self._prompt_pressure_rating(on_done=done)
+        else:
+            done(self._prompt_pressure_rating())
 
-    def _prompt_pressure_rating(self):
+    def _show_notice(self, kind, title, message):
+        from tkinter import messagebox
+        if not self.hosted:
+            {"error": messagebox.showerror, "warning": messagebox.showwarning}.get(
+                kind, messagebox.showinfo)(title, message)
+            return
+        # Non-modal, so the other boards keep running and accepting input
+        win = tk.Toplevel(self.root)
+        win.title(title)
+        win.configure(bg=self.bg)
+        win.transient(self.root)
+        win.resizable(False, False)
+        tk.Label(win, text=message, bg=self.bg, fg=self.timer_fg if kind in ("error", "warning") else self.fg,
+                 font=("Segoe UI", 12, "bold")).pack(padx=24, pady=(16, 8))
+        self._mk_btn(win, "Okay", win.destroy).pack(pady=(0, 14))
+        win.lift()
+
+    def _ask_yes_no(self, title, message, on_yes):
+        """Call on_yes() if the user agrees; non-modal on hosted boards, like _show_notice."""
+        from tkinter import messagebox
+        if not self.hosted:
+            if messagebox.askyesno(title, message):
+                on_yes()
+            return
+        win = tk.Toplevel(self.root)
+        win.title(title)
+        win.configure(bg=self.bg)
+        win.transient(self.root)
+        win.resizable(False, False)
+        tk.Label(win, text=message, bg=self.bg, fg=self.fg,
+                 font=("Segoe UI", 12, "bold")).pack(padx=24, pady=(16, 8))
+        row = tk.Frame(win, bg=self.bg)
+        row.pack(pady=(0, 14))
+
+        def yes():
+            win.destroy()
+            on_yes()
+        self._mk_btn(row, "No", win.destroy).pack(side="right", padx=(6, 0))
+        self._mk_btn(row, "Yes", yes).pack(side="right", padx=(0, 6))
+        win.lift()
+
+    def _prompt_pressure_rating(self, on_done=None):
+        """Modal by default and returns the rating; with on_done, non-modal, returns the dialog
+        and calls on_done(rating)."""
+        from tkinter import messagebox
         dialog = tk.Toplevel(self.root)
-        dialog.title("Pressure Rating")
+        title = "Pressure Rating"
+        if self.board_id is not None:
+            title += f" - Board {self.board_id}"
+        dialog.title(title)
         dialog.configure(bg=self.bg)
         dialog.transient(self.root)
-        dialog.grab_set()
+        if on_done is None:
+            dialog.grab_set()
         dialog.resizable(False, False)
         var = tk.IntVar(value=0)
         options = [
@@ -560,14 +1113,22 @@ class HanoiGUI:
         def on_ok():
             choice = var.get()
             if choice == 0:
-                messagebox.showwarning("Select the answer before pressing the ,Okay button.")
+                if on_done is not None:
+                    self._show_notice("warning", "Pressure Rating",
+                                      "Select the answer before pressing the ,Okay button.")
+                else:
+                    messagebox.showwarning("Select the answer before pressing the ,Okay button.", parent=dialog)
                 return
             dialog.result = choice
             dialog.destroy()
+            if on_done is not None:
+                on_done(choice)
 
         def on_cancel():
             dialog.result = None
             dialog.destroy()
+            if on_done is not None:
+                on_done(None)
 
         cancel_btn = self._mk_btn(button_row, "Cancel", on_cancel)
         cancel_btn.pack(side="right", padx=(0, 6))
@@ -576,6 +1137,8 @@ class HanoiGUI:
 
         dialog.protocol("WM_DELETE_WINDOW", on_cancel)
         dialog.lift()
+        if on_done is not None:
+            return dialog
         self.root.wait_window(dialog)
         return dialog.result
 
@@ -593,10 +1156,11 @@ class HanoiGUI:
         return str(raw_ms)
 
     # ---------- Save & Table ----------
-    def _save_record(self):
+    def _save_record(self, quiet=False):
         name = self.name_var.get().strip()
         if not name:
-            messagebox.showwarning("กรุณาใส่ชื่อ", "โปรดกรอกชื่อผู้เล่นก่อนกด Save")
+            self.trial_end_t0 = None  # the switch is timed from the Save that succeeds
+            self._show_notice("warning", "กรุณาใส่ชื่อ", "โปรดกรอกชื่อผู้เล่นก่อนกด Save")
             self.name_entry.focus_set()
             return
         timer_set_str = f"{self.timer_minutes}:00" if self.timer_minutes >= 1 else "0:00"
@@ -625,21 +1189,31 @@ class HanoiGUI:
             "Remaining time": remaining_str,
             "Time spent": self._format_elapsed_ms(time_spent_ms),
             "Time spent(ms)": str(time_spent_ms),
+            "Saved at": time.strftime("%Y-%m-%d %H:%M:%S"),
         }
-        self.records.append(record)
-        messagebox.showinfo("Saved", "บันทึกข้อมูลเรียบร้อย")
-        self._refresh_table_window()
+        if self.protocol is not None and self.trial_finished and self.trial_end_t0 is None:
+            self.trial_end_t0 = time.perf_counter()
+        if not self.store.add(record):
+            if not quiet:
+                self._show_notice("warning", "Not saved", "มีรายการนี้อยู่แล้ว (บันทึกซ้ำ) จึงไม่ได้บันทึกเพิ่ม")
+        else:
+            if not quiet:
+                self._show_notice("info", "Saved", "บันทึกข้อมูลเรียบร้อย")
+            self.store.notify()
+        if self.protocol is not None and self.trial_finished:
+            self._next_trial()
 
     def _open_table_window(self):
+        from tkinter import ttk
         if self.table_window is None or not self._widget_exists(self.table_window):
             self.table_window = tk.Toplevel(self.root)
             self.table_window.title("Statistics")
             self.table_window.configure(bg=self.bg)
-            self.table_window.geometry("1250x420")
+            self.table_window.geometry("1420x420")
             self.table_window.resizable(True, True)
             self.table_window.protocol("WM_DELETE_WINDOW", self._close_table_window)
 
-            columns = ("Name", "Num of Disc", "Move", "Breaking rules", "Pressure", "Timer", "Remaining time", "Time spent", "Time spent (ms)")
+            columns = ("Name", "Num of Disc", "Move", "Breaking rules", "Pressure", "Timer", "Remaining time", "Time spent", "Time spent (ms)", "Saved at")
             self.table_tree = ttk.Treeview(self.table_window, columns=columns, show="headings")
             for col in columns:
                 self.table_tree.heading(col, text=col)
@@ -651,10 +1225,13 @@ class HanoiGUI:
                     width = 130
                 elif col == "Time spent (ms)":
                     width = 140
+                elif col == "Saved at":
+                    width = 160
                 else:
                     width = 120
                 self.table_tree.column(col, anchor="center", width=width, stretch=False)
             self.table_tree.pack(fill="both", expand=True, padx=8, pady=(8,4))
+            self.table_row_count = 0
 
             # Export buttons
             btns = tk.Frame(self.table_window, bg=self.bg)
@@ -663,24 +1240,40 @@ class HanoiGUI:
             export_csv = self._mk_btn(btns, "Export CSV", self._export_csv)
             export_xlsx.pack(side="left", padx=(0,6))
             export_csv.pack(side="left", padx=(0,6))
+            import_btn = self._mk_btn(btns, "Import / Merge", self._import_records)
+            import_btn.pack(side="left", padx=(0,6))
 
         self._refresh_table_window()
         self.table_window.deiconify(); self.table_window.lift()
 
     def _close_table_window(self):
+        if self.table_fill_job is not None:
+            try: self.root.after_cancel(self.table_fill_job)
+            except Exception: pass
+            self.table_fill_job = None
         try:
             if self._widget_exists(self.table_window):
                 self.table_window.destroy()
         finally:
             self.table_window = None
             self.table_tree = None
+            self.table_row_count = 0
 
     def _refresh_table_window(self):
+        # Records are append-only, so only rows past table_row_count are inserted.
+        if self.table_tree is None or not self._widget_exists(self.table_tree):
+            return
+        if self.table_fill_job is None:
+            self._fill_table_rows()
+
+    def _fill_table_rows(self, batch=2000):
+        """Insert pending rows in batches so large merges keep the UI responsive."""
+        self.table_fill_job = None
         if self.table_tree is None or not self._widget_exists(self.table_tree):
             return
-        for item in self.table_tree.get_children():
-            self.table_tree.delete(item)
-        for rec in self.records:
+        start = self.table_row_count
+        end = min(len(self.records), start + batch)
+        for rec in self.records[start:end]:
             self.table_tree.insert("", "end", values=(
                 rec.get("Name", ""),
                 rec.get("Num of Disc", ""),
@@ -690,12 +1283,99 @@ class HanoiGUI:
                 rec.get("Timer", ""),
                 rec.get("Remaining time", ""),
                 self._get_time_spent_display(rec),
-                rec.get("Time spent(ms)", "")
+                rec.get("Time spent(ms)", ""),
+                rec.get("Saved at", "")
             ))
+        self.table_row_count = end
+        if end < len(self.records):
+            self.table_fill_job = self.root.after(1, self._fill_table_rows)
+
+    def _import_records(self):
+        from tkinter import filedialog
+        if self.import_job is not None:
+            self._show_notice("info", "Import", "กำลังนำเข้าไฟล์ก่อนหน้าอยู่ โปรดรอให้เสร็จก่อน")
+            return
+        paths = filedialog.askopenfilenames(filetypes=[("Exports", "*.csv *.xlsx"), ("CSV", "*.csv"),
+                                                       ("Excel Workbook", "*.xlsx")],
+                                            title="Import / Merge records")
+        if not paths:
+            return
+        self.root.config(cursor="watch")
+        self._start_import(paths)
+
+    def _start_import(self, paths, batch=5000):
+        """Parse files in a worker thread; the Tk thread only merges finished batches.
+
+        The store is only touched on the Tk thread, and the queue is bounded so
+        the reader cannot run far ahead of the merge.
+        """
+        import queue
+        import threading
+        results = queue.Queue(maxsize=8)
+
+        def read():
+            for path in paths:
+                chunk = []
+                try:
+                    for entry in RecordStore.iter_file_entries(path):
+                        chunk.append(entry)
+                        if len(chunk) >= batch:
+                            results.put(("batch", (path, chunk)))
+                            chunk = []
+                    results.put(("batch", (path, chunk)))
+                except Exception as e:
+                    results.put(("batch", (path, chunk)))  # rows read before the error, as merge_files() keeps them
+                    results.put(("failed", (path, e)))
+            results.put(("done", None))
+
+        self.import_job = {"added": 0, "duplicates": 0, "failed": [], "queue": results,
+                           "file_added": {}}   # path -> rows added so far
+        threading.Thread(target=read, name="hanoi-import", daemon=True).start()
+        self.root.after(20, self._pump_import)
+
+    def _pump_import(self, max_batches=4):
+        import queue
+        job = self.import_job
+        merged = False
+        for _ in range(max_batches):
+            try:
+                kind, payload = job["queue"].get_nowait()
+            except queue.Empty:
+                break
+            if kind == "batch":
+                path, chunk = payload
+                a, d = self.store.merge_entries(chunk)
+                job["file_added"][path] = job["file_added"].get(path, 0) + a
+                job["added"] += a
+                job["duplicates"] += d
+                merged = merged or a > 0
+            elif kind == "failed":
+                path, error = payload
+                # rows merged before the error stay in the store
+                job["failed"].append((path, error, job["file_added"].get(path, 0)))
+            else:
+                if merged:
+                    self.store.notify()
+                self._finish_import()
+                return
+        if merged:
+            self.store.notify()
+        self.root.after(20, self._pump_import)
+
+    def _finish_import(self):
+        job, self.import_job = self.import_job, None
+        self.root.config(cursor="")
+        added, duplicates, failed = job["added"], job["duplicates"], job["failed"]
+        summary = f"นำเข้า {added} รายการ (ข้ามรายการซ้ำ {duplicates})"
+        if failed:
+            summary += "\n\nFailed:\n" + "\n".join(
+                f"{p}: {e}" + (f" (partially imported: {n} added)" if n else "") for p, e, n in failed)
+        self._show_notice("warning" if failed else "info", "Import", summary)
 
     def _export_csv(self):
+        from tkinter import filedialog
         if not self.records:
-            messagebox.showinfo("ไม่มีข้อมูล", "ยังไม่มีข้อมูลให้ส่งออก")
+            self._show_notice("info", "ไม่มีข้อมูล", "ยังไม่มีข้อมูลให้ส่งออก")
             return
         path = filedialog.asksaveasfilename(defaultextension=".csv",
                                             filetypes=[("CSV", "*.csv")],
@@ -704,7 +1384,7 @@ class HanoiGUI:
             return
         with open(path, "w", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
-            writer.writerow(["Name", "Num of Disc", "Move", "Breaking rules", "Pressure", "Timer", "Remaining time", "Time spent", "Time spent (ms)"])
+            writer.writerow(["Name", "Num of Disc", "Move", "Breaking rules", "Pressure", "Timer", "Remaining time", "Time spent", "Time spent (ms)", "Saved at"])
             for r in self.records:
                 writer.writerow([
                     r.get("Name", ""),
@@ -715,20 +1395,22 @@ class HanoiGUI:
                     r.get("Timer", ""),
                     r.get("Remaining time", ""),
                     self._get_time_spent_display(r),
-                    r.get("Time spent(ms)", "")
+                    r.get("Time spent(ms)", ""),
+                    r.get("Saved at", "")
                 ])
-        messagebox.showinfo("Exported", f"ส่งออก CSV สำเร็จ:\n{path}")
+        self._show_notice("info", "Exported", f"ส่งออก CSV สำเร็จ:\n{path}")
 
     def _export_excel(self):
+        from tkinter import filedialog
         if not self.records:
-            messagebox.showinfo("ไม่มีข้อมูล", "ยังไม่มีข้อมูลให้ส่งออก")
+            self._show_notice("info", "ไม่มีข้อมูล", "ยังไม่มีข้อมูลให้ส่งออก")
             return
         try:
             import openpyxl
             from openpyxl.styles import Alignment, Font
         except Exception:
-            messagebox.showwarning("ต้องการ openpyxl",
-                                   "ไม่พบไลบรารี 'openpyxl' จึงจะสร้าง .xlsx ได้\nกำลังเปิดหน้าบันทึก CSV แทน")
+            self._show_notice("warning", "ต้องการ openpyxl",
+                              "ไม่พบไลบรารี 'openpyxl' จึงจะสร้าง .xlsx ได้\nกำลังเปิดหน้าบันทึก CSV แทน")
             self._export_csv()
             return
         path = filedialog.asksaveasfilename(defaultextension=".xlsx",
@@ -739,7 +1421,7 @@ class HanoiGUI:
         wb = openpyxl.Workbook()
         ws = wb.active
         ws.title = "Hanoi Stats"
-        headers = ["Name", "Num of Disc", "Move", "Breaking rules", "Pressure", "Timer", "Remaining time", "Time spent", "Time spent (ms)"]
+        headers = ["Name", "Num of Disc", "Move", "Breaking rules", "Pressure", "Timer", "Remaining time", "Time spent", "Time spent (ms)", "Saved at"]
         ws.append(headers)
         for r in self.records:
             ws.append([
@@ -751,7 +1433,8 @@ class HanoiGUI:
                 r.get("Timer", ""),
                 r.get("Remaining time", ""),
                 self._get_time_spent_display(r),
-                r.get("Time spent(ms)", "")
+                r.get("Time spent(ms)", ""),
+                r.get("Saved at", "")
             ])
         bold = Font(bold=True)
         for c, _h in enumerate(headers, start=1):
@@ -762,27 +1445,101 @@ class HanoiGUI:
             for cell in row:
                 cell.alignment = Alignment(horizontal="center")
         wb.save(path)
-        messagebox.showinfo("Exported", f"ส่งออก Excel สำเร็จ:\n{path}")
+        self._show_notice("info", "Exported", f"ส่งออก Excel สำเร็จ:\n{path}")
+
+    # ---------- Protocol ----------
+    def _finish_trial(self):
+        # Auto-save; without a name the operator fixes it and presses Save, which continues.
+        # Dialogs are closed by now; the switch time runs from here to the next board on screen
+        self.trial_finished = True
+        self.trial_end_t0 = time.perf_counter()
+        self._save_record(quiet=True)
+
+    def _stage_next_trial(self):
+        """Pre-build the next trial's discs as hidden canvas items (palette/layout come from the caches)."""
+        if self.staged_trial is not None:
+            self.canvas.delete(*self.staged_trial[1])
+            self.staged_trial = None
+        if self.protocol is None or not self.board_laid_out or self.trial_index + 1 >= len(self.protocol):
+            return
+        trial = self.protocol[self.trial_index + 1]
+        palette = gen_palette(trial.discs)
+        items = []
+        for level, size in enumerate(range(trial.discs, 0, -1)):
+            color = palette[size-1]
+            items.append(self.canvas.create_rectangle(*disc_rect(self.layout, trial.discs, size, 0, level),
+                                                      fill=color, outline=color, width=2,
+                                                      state="hidden", tags=("disc",)))
+        self.staged_trial = (trial, items)
+
+    def _next_trial(self):
+        t0, self.trial_end_t0 = self.trial_end_t0, None
+        if self.trial_index + 1 >= len(self.protocol):
+            self.trial_finished = False
+            self.interactions_enabled = False
+            self._update_protocol_label("protocol complete")
+            self._show_notice("info", "Protocol", "All trials are done.")
+            return
+        if t0 is None:
+            t0 = time.perf_counter()
+        if self.staged_trial is None:
+            self._stage_next_trial()
+
+        trial, items = self.staged_trial
+        self.staged_trial = None
+        self.trial_index += 1
+        self.num_discs = trial.discs
+        self.timer_minutes = trial.timer_minutes
+        self.disks_label_val.config(text=str(self.num_discs))
+        self.timer_min_label.config(text=str(self.timer_minutes))
+        self._reset_game_state()
+        self.canvas.delete(*[disc for stack in self.pegs for disc in stack])
+        self.pegs = [items, [], []]
+        self.disc_sizes = dict(zip(items, range(trial.discs, 0, -1)))
+        self.palette = gen_palette(trial.discs)
+        for disc in items:
+            self.canvas.itemconfigure(disc, state="normal")
+        self._update_min_moves()
+        self.canvas.update_idletasks()
+        # Save, table refresh and board swap together
+        gap_ms = (time.perf_counter() - t0) * 1000
+
+        self._update_protocol_label(f"switch {gap_ms:.1f} ms")
+        self._emit("trial_start", trial=self.trial_index + 1, block=trial.block, discs=trial.discs,
+                   timer_minutes=trial.timer_minutes, gap_ms=round(gap_ms, 3))
+        # Stage the following trial once the new board is on screen
+        self.root.after_idle(self._stage_next_trial)
+
+    def _update_protocol_label(self, note=""):
+        if self.protocol is None:
+            return
+        trial = self.protocol[self.trial_index]
+        text = f"Trial {self.trial_index + 1}/{len(self.protocol)}"
+        if trial.block:
+            text += f" (block {trial.block})"
+        if note:
+            text += f"  ·  {note}"
+        self.protocol_label.config(text=text)
 
     # ---------- Solver ----------
     def _solve_animate(self):
         if self.solving: return
         if len(self.pegs[0]) != self.num_discs:
-            if not messagebox.askyesno("Restart required", "Solver needs the starting position. Restart now?"):
-                return
-            self._new_game()
+            def restart_and_solve():
+                self._new_game()
+                self._start_solver()
+            self._ask_yes_no("Restart required", "Solver needs the starting position. Restart now?",
+                             restart_and_solve)
+            return
+        self._start_solver()
+
+    def _start_solver(self):
+        if self.solving: return
         self.solving = True
         self.interactions_enabled = False
-        moves = []
-        self._hanoi(self.num_discs, 0, 2, 1, moves)
+        moves = hanoi_moves(self.num_discs)
         self._animate_moves(moves, 0)
 
-    def _hanoi(self, n, src, dst, aux, moves):
-        if n == 0: return
-        self._hanoi(n-1, src, aux, dst, moves)
-        moves.append((src, dst))
-        self._hanoi(n-1, aux, dst, src, moves)
-
     def _animate_moves(self, moves, idx):
         if idx >= len(moves):
             self.solving = False
@@ -800,10 +1557,112 @@ class HanoiGUI:
         self._snap_disc_to_peg(disc, dst)
         self.moves += 1
         self._update_moves()
-        self.canvas.after(600, lambda: self._animate_moves(moves, idx+1))
+        self._record_move(self.disc_sizes[disc], src, dst)
+        self._emit("move", disc=self.disc_sizes[disc], from_peg=src+1, to_peg=dst+1, moves=self.moves, solver=True)
+        self.scheduler.call_later(600, lambda: self._animate_moves(moves, idx+1))
 
 
-if __name__ == "__main__":
+class BoardHost:
+    """Several independent boards in one Tk root, as notebook tabs or a grid of tiles.
+
+    Each board keeps its own game state, timer and move log; they share one
+    FrameScheduler, the cached palette/geometry and one RecordStore.
+    """
+    def __init__(self, root, count, layout="tabs", profile=None, telemetry=None, protocols=None):
+        self.root = root
+        self.root.title(f"Tower of Hanoi - {count} boards")
+        self.root.configure(bg=BOARD_BG)
+        self.scheduler = FrameScheduler(root)
+        self.store = RecordStore()
+        self.boards = []
+
+        if layout == "tabs":
+            from tkinter import ttk
+            container = ttk.Notebook(root)
+            container.pack(fill="both", expand=True)
+            frames = []
+            for i in range(count):
+                frame = tk.Frame(container, bg=BOARD_BG)
+                container.add(frame, text=f"Board {i+1}")
+                frames.append(frame)
+            self.root.geometry("1200x560")
+            self.root.minsize(1200, 560)
+        else:
+            cols = math.ceil(math.sqrt(count))
+            rows = math.ceil(count / cols)
+            frames = []
+            for i in range(count):
+                frame = tk.Frame(root, bg=BOARD_BG, highlightthickness=1, highlightbackground="#2a2f3a")
+                frame.grid(row=i // cols, column=i % cols, sticky="nsew")
+                frames.append(frame)
+            for c in range(cols):
+                root.columnconfigure(c, weight=1)
+            for r in range(rows):
+                root.rowconfigure(r, weight=1)
+            self.root.geometry(f"{min(1200 * cols, root.winfo_screenwidth())}x"
+                               f"{min(520 * rows, root.winfo_screenheight())}")
+
+        for i, frame in enumerate(frames):
+            self.boards.append(HanoiGUI(root, profile=profile if i == 0 else None, telemetry=telemetry,
+                                        parent=frame, scheduler=self.scheduler, store=self.store,
+                                        board_id=i+1, protocol=protocols[i] if protocols else None))
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Tower of Hanoi - GUI (Drag & Drop)")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="print time spent per startup phase to stderr")
+    parser.add_argument("--telemetry", metavar="ENDPOINT",
+                        help="stream game events to tcp://HOST:PORT, unix:///PATH or http://HOST:PORT/PATH")
+    parser.add_argument("--telemetry-source", metavar="ID",
+                        help="stream id reported to the collector (default: hostname-pid)")
+    parser.add_argument("--telemetry-spill", metavar="FILE",
+                        help="spill events here while the collector is unreachable instead of dropping them")
+    parser.add_argument("--boards", type=int, default=1, metavar="N",
+                        help="host N independent boards in this process (default 1)")
+    parser.add_argument("--layout", choices=("tabs", "tiles"), default="tabs",
+                        help="how to arrange multiple boards (default tabs)")
+    parser.add_argument("--protocol", metavar="FILE",
+                        help="run the trial schedule in FILE (CSV or JSON: discs, timer[, block])")
+    parser.add_argument("--participant", type=int, default=0, metavar="K",
+                        help="counterbalancing index for --protocol; hosted boards use K, K+1, ...")
+    args = parser.parse_args(argv)
+    if args.boards < 1:
+        parser.error("--boards must be at least 1")
+
+    protocols = None
+    if args.protocol:
+        try:
+            protocols = [load_protocol(args.protocol, args.participant + i) for i in range(args.boards)]
+        except (OSError, ValueError) as e:
+            parser.error(f"--protocol: {e}")
+
+    telemetry = None
+    if args.telemetry:
+        from hanoi_telemetry import TelemetrySender
+        telemetry = TelemetrySender(args.telemetry, source=args.telemetry_source,
+                                    spill_path=args.telemetry_spill)
+
+    profile = None
+    if args.startup_profile:
+        profile = StartupProfile(_IMPORT_T0)
+        profile.mark("import")
     root = tk.Tk()
-    app = HanoiGUI(root)
-    root.mainloop()
+    if profile is not None:
+        profile.mark("tk root")
+    if args.boards > 1:
+        app = BoardHost(root, args.boards, args.layout, profile=profile, telemetry=telemetry,
+                        protocols=protocols)
+    else:
+        app = HanoiGUI(root, profile=profile, telemetry=telemetry,
+                       protocol=protocols[0] if protocols else None)
+    try:
+        root.mainloop()
+    finally:
+        if telemetry is not None:
+            telemetry.close()
+
+
+if __name__ == "__main__":
+    main()